@@ -1,32 +1,77 @@
-
+import argparse
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from scripts.calc_ERA5_monthlies import calc_era5_monthlies
-from scripts.preprocess_v2 import preprocess_v2
-from scripts.download_era5_hourly import download_era5_hourly
-
-
-# specify years for analysis
-#years = ['2024', '2025']
-# create list of years from 1940 to 2024
-years = [str(year) for year in range(2014, 2025)]
+# Pipeline modules are imported inside each stage so that a run only pays the
+# import cost (cdsapi, scipy, ...) of the stages it actually executes.
 
+STAGES = ['download', 'monthlies', 'preprocess', 'trends', 'ensemble']
 
 # specify months for analysis
 months = ['01', '02', '03', '04', '05', '06', '07', '08', '09', '10', '11', '12']
 
-# download ERA5 hourly data
-download_era5_hourly(years, months)
 
+def run_download(years, fail_fast):
+    # download ERA5 hourly data
+    from scripts.download_era5_hourly import download_era5_hourly
+    download_era5_hourly(years, months)
+
+
+def run_monthlies(years, fail_fast):
+    # calculate monthly averages
+    from scripts.calc_ERA5_monthlies import calc_era5_monthlies
+    calc_era5_monthlies(years, fail_fast=fail_fast)
+
+
+def run_preprocess(years, fail_fast):
+    # preprocess monthly averaged data
+    from scripts.preprocess_data import preprocess_v2
+    preprocess_v2(fail_fast=fail_fast)
+
+
+def run_trends(years, fail_fast):
+    # calculate per-cell trends over the selected years
+    from scripts.calc_trends import calc_trends
+    calc_trends(time_slice=(f'{years[0]}-01-01', f'{years[-1]}-12-31'))
+
+
+def run_ensemble(years, fail_fast):
+    # compare all registered products over the selected years
+    from scripts.calc_ensemble_metrics import calc_ensemble_metrics
+    calc_ensemble_metrics(time_slice=(f'{years[0]}-01-01', f'{years[-1]}-12-31'))
+
+
+STAGE_FUNCTIONS = {
+    'download': run_download,
+    'monthlies': run_monthlies,
+    'preprocess': run_preprocess,
+    'trends': run_trends,
+    'ensemble': run_ensemble,
+}
 
-# calculate monthly averages
-calc_era5_monthlies(years)
 
-# preprocess monthly averaged data
-preprocess_v2()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Berkeley Earth vs ERA5 processing pipeline")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=['download', 'monthlies', 'preprocess'],
+                        help="pipeline stages to run, executed in pipeline order")
+    parser.add_argument('--start-year', type=int, default=2014, help="first year to process")
+    parser.add_argument('--end-year', type=int, default=2024, help="last year to process (inclusive)")
+    parser.add_argument('--no-fail-fast', action='store_true',
+                        help="record failed quality checks in the report instead of stopping")
+    args = parser.parse_args(argv)
+    if args.start_year > args.end_year:
+        parser.error(f"--start-year ({args.start_year}) must not be after --end-year ({args.end_year})")
+    return args
 
-# calculate metrics
 
+def main(argv=None):
+    args = parse_args(argv)
+    years = [str(year) for year in range(args.start_year, args.end_year + 1)]
+    for stage in STAGES:
+        if stage in args.stages:
+            print(f"Running stage: {stage}")
+            STAGE_FUNCTIONS[stage](years, fail_fast=not args.no_fail_fast)
 
 
+if __name__ == "__main__":
+    main()
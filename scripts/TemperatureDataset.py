@@ -5,32 +5,65 @@ import os
 project_root = Path(os.getcwd()).parent
 sys.path.insert(0, str(project_root))
 from src.data_loading.simple_loader import load_processed_berkeley_earth, load_processed_era5, load_config
+from src.data_loading.cube_cache import CubeCache
 
 
 
 class TemperatureDatasetMetrics:
-    
-    def __init__(self, variable='tavg'):
+
+    def __init__(self, variable='tavg', use_cache=True, baseline=None):
         """
         Initialize with a specific temperature variable.
 
         Variables: 'tavg', 'tmin', 'tmax'
+
+        With use_cache, the derived abs_temp, difference and abs_difference
+        cubes are memory-mapped from the on-disk cube cache when the processed
+        files are unchanged, instead of being recomputed.
+
+        baseline=(start_year, end_year) re-references both datasets' anomalies
+        to that baseline instead of 1951-1980.
         """
         self.variable = variable
-        self.be_data = load_processed_berkeley_earth(variable)
-        self.be_data['abs_temp'] = self.be_data.temperature.groupby('time.month')+self.be_data.climatology.rename({'month_number': 'month'})
-
-        self.era5_data = load_processed_era5(variable)
-        self.era5_data['abs_temp'] = self.era5_data.temperature.groupby('time.month') + self.era5_data.climatology - 273.15
-        
-        self.difference= self.be_data.temperature - self.era5_data.temperature
-        self.abs_difference = self.be_data.abs_temp - self.era5_data.abs_temp
-        
         self.config = load_config()
-        
+        self.be_data = load_processed_berkeley_earth(variable, baseline=baseline)
+        self.era5_data = load_processed_era5(variable, baseline=baseline)
+
+        cubes = None
+        if use_cache:
+            cache = CubeCache.from_config(self.config)
+            key = CubeCache.key(
+                [self.config['processed'][variable]['berkeley_earth_file'],
+                 self.config['processed'][variable]['era5_file']],
+                variable=variable,
+                baseline=baseline,
+            )
+            cubes = cache.get(key)
+
+        if cubes is None:
+            cubes = self._derive_cubes()
+            if use_cache:
+                cubes = cache.put(key, cubes)
+
+        self.be_data['abs_temp'] = cubes['be_abs_temp']
+        self.era5_data['abs_temp'] = cubes['era5_abs_temp']
+        self.difference = cubes['difference']
+        self.abs_difference = cubes['abs_difference']
+
+    def _derive_cubes(self):
+        """Compute the derived cubes from the processed BE and ERA5 data."""
+        be_abs_temp = self.be_data.temperature.groupby('time.month')+self.be_data.climatology.rename({'month_number': 'month'})
+        era5_abs_temp = self.era5_data.temperature.groupby('time.month') + self.era5_data.climatology - 273.15
+        return {
+            'be_abs_temp': be_abs_temp,
+            'era5_abs_temp': era5_abs_temp,
+            'difference': self.be_data.temperature - self.era5_data.temperature,
+            'abs_difference': be_abs_temp - era5_abs_temp,
+        }
+
     def slice_data(self, time_slice=('1940-01-01', '2025-01-01'), lat_slice=(-90, 90), lon_slice=(-180, 180), land_only_flag=False):
         """Slice the data based on time, latitude, and longitude."""
-        
+
         if land_only_flag:
             self.be_slice = self.be_data.sel(time=slice(*time_slice), latitude=slice(*lat_slice), longitude=slice(*lon_slice)).where(self.be_data.land_mask)
             self.era5_slice = self.era5_data.sel(time=slice(*time_slice), latitude=slice(*lat_slice), longitude=slice(*lon_slice)).where(self.be_data.land_mask)
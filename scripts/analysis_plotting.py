@@ -1,9 +1,15 @@
-import gstools as gs
 import numpy as np
 import xarray as xr
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
+# gstools, matplotlib and cartopy are imported inside the plotting functions
+# so that importing this module stays cheap for headless jobs
+
+
+def _map_modules():
+    """Import the plotting and map projection modules on first use."""
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+    return plt, ccrs, cfeature
 
 
 def seasonal_weighted_by_year(da, season):
@@ -26,6 +32,7 @@ def seasonal_weighted_by_year(da, season):
 
 
 def map_plots(ds1,ds2,title1,title2):
+    plt, ccrs, cfeature = _map_modules()
     # compare summer tavg temperatures
     plt.figure(figsize=(18, 6))
     ax1 = plt.subplot(1, 3, 1, projection=ccrs.PlateCarree())
@@ -61,6 +68,7 @@ def map_plots(ds1,ds2,title1,title2):
 
 def variogram(lats,lons,temps):
     """Calculate variograms using gstools"""
+    import gstools as gs
     bc,gamma = gs.vario_estimate(
         (lons, lats), temps,
         mesh_type="structured",
@@ -85,6 +93,7 @@ def plot_variogram(lats,lons,be,era5,ax1):
 
 
 def map_plots_v2(ds1,ds2,title1,title2,lats,lons):
+    plt, ccrs, cfeature = _map_modules()
     # calculate temporal mean
     ds1_mean = ds1.mean(dim='year')
     ds2_mean = ds2.mean(dim='year')
@@ -155,6 +164,7 @@ def plot_average(TAVG,TMAX,TMIN,vec):
     TAVG, TMAX, TMIN are temperature dataset objects
     vec is the spatial extent of the map plots
     """
+    plt, ccrs, cfeature = _map_modules()
     weights = TAVG.be_slice.areal_weight.fillna(0)
     BE_avg = TAVG.be_slice.temperature.weighted(weights).mean(dim=['latitude','longitude'])
     ER_avg = TAVG.era5_slice.temperature.weighted(weights).mean(dim=['latitude','longitude'])
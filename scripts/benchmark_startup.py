@@ -0,0 +1,63 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Measure the import (startup) time of the pipeline modules. Each module is
+# imported in a fresh interpreter so nothing is shared between measurements.
+project_root = Path(__file__).resolve().parent.parent
+
+MODULES = [
+    'main',
+    'src.data_loading.simple_loader',
+    'src.data_loading.point_extraction',
+    'src.data_loading.cube_cache',
+    'src.analysis.trends',
+    'scripts.download_era5_hourly',
+    'scripts.calc_ERA5_monthlies',
+    'scripts.preprocess_data',
+    'scripts.analysis_plotting',
+]
+
+# heavy optional dependencies that should not be loaded by a plain import
+HEAVY_MODULES = ['cdsapi', 'gstools', 'cartopy', 'matplotlib']
+
+
+def time_import(module, repeats=3):
+    """Return the best wall time of importing module in a fresh interpreter, and the heavy modules it loaded."""
+    code = (
+        f"import sys, time; t = time.perf_counter(); import {module}; "
+        f"print(time.perf_counter() - t, ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules) or '-')"
+    )
+    best, loaded = float('inf'), ''
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, '-c', code], cwd=project_root, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        elapsed, loaded = result.stdout.strip().splitlines()[-1].split(' ')
+        best = min(best, float(elapsed))
+    return best, loaded
+
+
+def benchmark_startup(modules=MODULES, repeats=3):
+    print(f"{'module':40s} {'import time (s)':>16s}  heavy modules loaded")
+    results = {}
+    for module in modules:
+        elapsed, loaded = time_import(module, repeats)
+        results[module] = elapsed
+        if elapsed is None:
+            print(f"{module:40s} {'failed':>16s}  {loaded}")
+        else:
+            print(f"{module:40s} {elapsed:16.3f}  {loaded}")
+
+    # full CLI round trip for the cheapest possible invocation
+    start = time.perf_counter()
+    subprocess.run([sys.executable, 'main.py', '--help'], cwd=project_root, capture_output=True)
+    results['main.py --help'] = time.perf_counter() - start
+    print(f"{'main.py --help (wall)':40s} {results['main.py --help']:16.3f}")
+    return results
+
+
+# Run from command line
+if __name__ == "__main__":
+    benchmark_startup()
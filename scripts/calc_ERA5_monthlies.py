@@ -3,29 +3,55 @@ import yaml
 from pathlib import Path
 import pandas as pd
 import numpy as np
+import calendar
 import sys
 # Dynamically determine the project root directory
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))  # Add project root to sys.path
 from src.data_loading.simple_loader import load_config
+from src.preprocessing.validation import QualityReport
 
 
-def calc_era5_monthlies(years):
+def expected_months(year):
+    # all months of past years, only completed months of the current year
+    today = pd.Timestamp.today()
+    last_month = today.month - 1 if int(year) == today.year else 12
+    return [f"{month:02d}" for month in range(1, last_month + 1)]
+
+
+def calc_era5_monthlies(years, fail_fast=True):
     # load monthly netcdf hourly ERA5 data and save in monthly output netcdf files
     config = load_config()
 
+    # quality checks are collected from the data already loaded in this loop
+    report = QualityReport('era5_monthlies', path=project_root / 'output' / 'reports' / 'era5_monthlies_quality.json',
+                           fail_fast=fail_fast, thresholds=config.get('validation'))
+
     # path to load hourly data
     path = Path(config['ERA5_hourly_folder'])
     
     # loop through each month of each year, calculate monthly TAVG, TMAX, and TMIN
     for year in years:
         year_path = path / str(year)
+        if not year_path.exists():
+            # a missing year directory means every month of that year is missing
+            report.check_coverage(f"{year}_months", [], expected_months(year))
+            continue
         months = [f for f in year_path.iterdir() if f.is_dir()]
         months.sort(key=lambda x: x.name)
+        report.check_coverage(f"{year}_months", [m.name for m in months], expected_months(year))
         for month in months:
             file = [f for f in month.iterdir() if f.suffix == '.nc']
+            report.record(f"{year}-{month.name}_files", len(file) == 1, files=[f.name for f in file])
+            if not file:
+                continue
             ds = xr.open_dataset(file[0])
 
+            # check that every hour of the month is present
+            expected_hours = calendar.monthrange(int(year), int(month.name))[1] * 24
+            report.record(f"{year}-{month.name}_hours", ds.sizes['valid_time'] == expected_hours,
+                          hours=ds.sizes['valid_time'], expected=expected_hours)
+
             month_avg = xr.Dataset()
 
             # Add latitude and longitude as coordinates
@@ -60,12 +86,22 @@ def calc_era5_monthlies(years):
                 dims=('time', 'latitude', 'longitude')
             )
 
+            # check value ranges and that TMIN <= TAVG <= TMAX
+            for var in ['TAVG', 'TMAX', 'TMIN']:
+                report.check_value_range(f"{year}-{month.name}_{var}_range", month_avg[var].values,
+                                         report.thresholds['era5_kelvin_range'])
+            inverted = int(((month_avg['TMIN'] > month_avg['TAVG']) | (month_avg['TAVG'] > month_avg['TMAX'])).sum())
+            report.record(f"{year}-{month.name}_ordering", inverted == 0, inverted_cells=inverted)
+
             # Save monthly averages to netcdf file
             savepath = Path(config['ERA5_monthly_folder'])
             savepath.mkdir(parents=True, exist_ok=True)
             month_avg.to_netcdf(savepath / f"monthly_avg_{year}_{month.name}.nc", mode='w')
             print(f"Saved ERA5 Raw Monthly {year} - {month}")
 
+    report.write()
+    print(f"Saved quality report {report.path}")
+
 
 # Run from command line
 if __name__ == "__main__":
@@ -78,4 +114,4 @@ if __name__ == "__main__":
     else:
         # Default range of years
         years = range(1940, 2026)
-    main(years)
\ No newline at end of file
+    calc_era5_monthlies(years)
\ No newline at end of file
@@ -0,0 +1,24 @@
+from pathlib import Path
+import os
+import sys
+# Dynamically determine the project root directory
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))  # Add project root to sys.path
+from src.data_loading.simple_loader import load_processed_berkeley_earth, load_processed_era5, load_config
+from src.preprocessing.baselines import baseline_statistics, write_baseline_statistics
+
+
+def calc_baseline_stats(variables=('tavg', 'tmax', 'tmin')):
+    # compute baseline statistics for already processed files, without rerunning preprocess_v2
+    config = load_config()
+    for variable in variables:
+        for product, loader in (('berkeley_earth_file', load_processed_berkeley_earth), ('era5_file', load_processed_era5)):
+            ds = loader(variable)
+            processed_file = os.path.expanduser(config['processed'][variable][product])
+            write_baseline_statistics(baseline_statistics(ds.temperature, ds.climatology), processed_file)
+            print(f"Saved baseline statistics for {processed_file}")
+
+
+# run from command line
+if __name__ == "__main__":
+    calc_baseline_stats()
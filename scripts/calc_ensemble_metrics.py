@@ -0,0 +1,36 @@
+import os
+from pathlib import Path
+import sys
+# Dynamically determine the project root directory
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))  # Add project root to sys.path
+from src.data_loading.simple_loader import load_processed_berkeley_earth, load_config
+from src.data_loading.products import build_product_cube, load_product_cube, product_cube_is_current
+from src.analysis.ensemble import ensemble_metrics
+
+
+def calc_ensemble_metrics(variables=('tavg', 'tmax', 'tmin'), time_slice=None, rebuild=False, land_only_flag=False):
+    # regrid all registered products into one cube per variable, then compute
+    # ensemble and pairwise metrics in a single pass over each cube. Cubes are
+    # only rebuilt when missing, stale or rebuild=True
+    config = load_config()
+    save_path = Path(os.path.expanduser(config['ensemble_folder']))
+    save_path.mkdir(parents=True, exist_ok=True)
+    land_mask = load_processed_berkeley_earth('tavg').land_mask if land_only_flag else None
+
+    for variable in variables:
+        if rebuild or not product_cube_is_current(variable):
+            build_product_cube(variable)
+        else:
+            print(f"Reusing {variable.upper()} product cube")
+        cube = load_product_cube(variable)
+        metrics = ensemble_metrics(cube.temperature, time_slice=time_slice, land_mask=land_mask)
+        metrics.attrs.update(cube.attrs)
+        metrics.to_netcdf(save_path / f"ensemble_metrics_{variable.upper()}.nc")
+        print(f"Saved {variable.upper()} ensemble metrics")
+        print(metrics.bias_matrix.to_pandas())
+
+
+# Run from command line
+if __name__ == "__main__":
+    calc_ensemble_metrics()
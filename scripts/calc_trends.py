@@ -0,0 +1,31 @@
+from pathlib import Path
+import sys
+# Dynamically determine the project root directory
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))  # Add project root to sys.path
+from src.data_loading.simple_loader import load_config
+from src.analysis.trends import calculate_trends, write_trends
+from scripts.TemperatureDataset import TemperatureDatasetMetrics
+
+
+def calc_trends(variables=('tavg', 'tmax', 'tmin'), time_slice=None, method='ols', land_only_flag=False):
+    # calculate per-cell trends for each variable and save as gridded netcdf files
+    config = load_config()
+    save_path = Path(config['trends_folder'])
+
+    for variable in variables:
+        metrics = TemperatureDatasetMetrics(variable=variable)
+        trends = calculate_trends(metrics, time_slice=time_slice, method=method, land_only_flag=land_only_flag)
+        write_trends(trends, save_path / f"trends_{variable.upper()}_{method}.nc")
+        print(f"Saved {variable.upper()} {method} trends")
+
+
+# Run from command line
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # optional start and end year of the trend period
+        start_year = sys.argv[1]
+        end_year = sys.argv[2] if len(sys.argv) > 2 else '2024'
+        calc_trends(time_slice=(f'{start_year}-01-01', f'{end_year}-12-31'))
+    else:
+        calc_trends()
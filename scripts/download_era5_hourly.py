@@ -1,4 +1,3 @@
-import cdsapi
 import os
 import numpy as np
 # run API to download ERA5 hourly data and save in specified folder 
@@ -11,6 +10,9 @@ years = np.arange(2014,2026).astype(str)
 months = ["01", "02", "03", "04", "05", "06", "07", "08", "09", "10", "11", "12"]
 
 def download_era5_hourly(years, months, var = ["2m_temperature"]):
+    # cdsapi is only needed for downloading, import it here to keep other stages fast
+    import cdsapi
+
     for year in years:
         for month in months:
             # create target directory for each month
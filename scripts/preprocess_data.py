@@ -7,6 +7,8 @@ import sys
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))  # Add project root to sys.path
 from src.data_loading.simple_loader import load_berkeley_earth, load_era5, load_config
+from src.preprocessing.baselines import baseline_statistics, write_baseline_statistics
+from src.preprocessing.validation import QualityReport
 
 def decimal_year_to_datetime(decimal_years):
     """Convert decimal years to datetime objects."""
@@ -20,8 +22,13 @@ def decimal_year_to_datetime(decimal_years):
         datetimes.append(date)
     return np.array(datetimes, dtype='datetime64[ns]')
 
-def preprocess_v2():
-    
+def preprocess_v2(fail_fast=True):
+
+    # quality checks are collected from the arrays already loaded below
+    config = load_config()
+    report = QualityReport('preprocess_v2', path=project_root / 'output' / 'reports' / 'preprocess_quality.json',
+                           fail_fast=fail_fast, thresholds=config.get('validation'))
+
     # load monthly averages
     print("Processing Berkeley Earth and ERA5 data")
     print("Loading data")
@@ -41,6 +48,13 @@ def preprocess_v2():
     if era5['time'].dtype != 'datetime64[ns]':
         era5['time'] = decimal_year_to_datetime(era5.time)
 
+    # check BE decimal-year times against each other and the ERA5 mean valid times
+    print("Checking time alignment")
+    report.check_time_alignment('be_tmin_time_alignment', be_tmin.time, be_tavg.time, full_range=True)
+    report.check_time_alignment('be_tmax_time_alignment', be_tmax.time, be_tavg.time, full_range=True)
+    report.check_time_alignment('era5_be_time_alignment', era5.time, be_tavg.time)
+    era5_period = slice(era5.time.values[0], era5.time.values[-1])
+
      # 3. Convert ERA5 longitude to -180 to 180
     print("Converting ERA5 longitude")
     era5 = era5.assign_coords(longitude=(era5.longitude + 180) % 360 - 180)
@@ -56,6 +70,14 @@ def preprocess_v2():
     era5['TMAX'] = era5.TMAX.where(~np.isnan(be_tmax.temperature))
     era5['TMIN'] = era5.TMIN.where(~np.isnan(be_tmin.temperature))
 
+    # masked ERA5 should have no more NaNs than BE over the ERA5 period
+    print("Checking NaN fractions and value ranges")
+    for var, be in [('TAVG', be_tavg), ('TMAX', be_tmax), ('TMIN', be_tmin)]:
+        report.check_nan_fraction(f'era5_{var}_masked_nan_fraction', era5[var].sel(time=era5_period).values,
+                                  be.temperature.sel(time=era5_period).values)
+        report.check_value_range(f'era5_{var}_range', era5[var].values, report.thresholds['era5_kelvin_range'])
+        report.check_value_range(f'be_{var}_anomaly_range', be.temperature.values, report.thresholds['anomaly_range'])
+
     # 2. Calculate ERA5 monthly anomalies based on 1951-1980 monthly averages
     print("Calculating ERA5 climatology and monthly anomalies")
     era5['TAVG_clim'] = era5['TAVG'].sel(time=slice('1951-01-01', '1980-12-31')).groupby('time.month').mean('time') # 1950-1980 average
@@ -66,6 +88,11 @@ def preprocess_v2():
     era5['TMAX_temp'] = era5['TMAX'].groupby('time.month') - era5['TMAX_clim'] # anomaly calculation
     era5['TMIN_temp'] = era5['TMIN'].groupby('time.month') - era5['TMIN_clim'] # anomaly calculation
 
+    for var in ['TAVG', 'TMAX', 'TMIN']:
+        report.check_value_range(f'era5_{var}_anomaly_range', era5[f'{var}_temp'].values, report.thresholds['anomaly_range'])
+    report.write()
+    print(f"Saved quality report {report.path}")
+
     # 6. Create an xarray dataset for each variable
     print("Saving processed netcdf files")
     ERA5_TAVG = xr.Dataset({
@@ -94,7 +121,6 @@ def preprocess_v2():
     })
 
     # Create output directories, get filepaths from the config.yaml file
-    config = load_config()
 
     # Paths for Berkeley Earth and ERA5 processed files
     BE_TAVG_path = Path(config['processed']['tavg']['berkeley_earth_file'])
@@ -134,6 +160,17 @@ def preprocess_v2():
     ERA5_TMAX.to_netcdf(ERA5_TMAX_path)
     print("Saved ERA5 TMAX")
 
+    # 7. Save per-decade monthly sums and counts so anomalies can be rebased
+    # to other baselines without reprocessing
+    print("Saving baseline statistics")
+    write_baseline_statistics(baseline_statistics(be_tavg.temperature, be_tavg.climatology), BE_TAVG_path)
+    write_baseline_statistics(baseline_statistics(be_tmin.temperature, be_tmin.climatology), BE_TMIN_path)
+    write_baseline_statistics(baseline_statistics(be_tmax.temperature, be_tmax.climatology), BE_TMAX_path)
+    write_baseline_statistics(baseline_statistics(era5['TAVG']), ERA5_TAVG_path)
+    write_baseline_statistics(baseline_statistics(era5['TMIN']), ERA5_TMIN_path)
+    write_baseline_statistics(baseline_statistics(era5['TMAX']), ERA5_TMAX_path)
+    print("Saved baseline statistics")
+
 # run from command line
 if __name__ == "__main__":
     preprocess_v2()
\ No newline at end of file
@@ -0,0 +1,110 @@
+import numpy as np
+import xarray as xr
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _ensemble_band(x):
+    """
+    Per-cell ensemble and pairwise metrics for one band of the product cube.
+
+    x has shape (product, time, cells) with NaN where a product is missing.
+    Pairwise sums are formed with einsum over the product axes, so all N^2
+    product pairs are computed in one pass over the band.
+    """
+    valid = np.isfinite(x)
+    v = valid.astype('float32')
+    x0 = np.where(valid, x, 0).astype('float32')
+
+    # pairwise sums over the times where both products are valid
+    count = np.einsum('ptn,qtn->pqn', v, v, dtype='float64')
+    sum_x = np.einsum('ptn,qtn->pqn', x0, v, dtype='float64')     # sum of p where q is valid
+    sum_xx = np.einsum('ptn,qtn->pqn', x0, x0, dtype='float64')   # sum of p * q
+    sum_sq = np.einsum('ptn,qtn->pqn', x0 ** 2, v, dtype='float64')
+    diff_sum = sum_x - sum_x.transpose(1, 0, 2)
+    sq_diff_sum = sum_sq + sum_sq.transpose(1, 0, 2) - 2 * sum_xx
+    diagonal = np.arange(x.shape[0])
+    sq_diff_sum[diagonal, diagonal] = 0  # remove rounding error of p - p
+
+    # ensemble statistics over the times where every product is valid
+    all_valid = valid.all(axis=0)
+    n_all = all_valid.sum(axis=0)
+    member_mean = x0.mean(axis=0)
+    member_std = np.sqrt(((x0 - member_mean) ** 2).mean(axis=0))
+    # rank 1 is the coldest product, counted by pairwise comparison
+    ranks = np.ones(x.shape, dtype='int16')
+    for q in range(x.shape[0]):
+        ranks += x0[q] < x0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ens_mean = np.where(all_valid, member_mean, 0).sum(axis=0) / n_all
+        ens_spread = np.where(all_valid, member_std, 0).sum(axis=0) / n_all
+        mean_rank = np.where(all_valid, ranks, 0).sum(axis=1) / n_all
+        bias = diff_sum / count
+        rmsd = np.sqrt(np.clip(sq_diff_sum, 0, None) / count)
+
+    return {
+        'ensemble_mean': ens_mean,
+        'ensemble_spread': ens_spread,
+        'mean_rank': mean_rank,
+        'bias': bias,
+        'rmsd': rmsd,
+        # sums kept for the area-weighted global matrices
+        '_count': count,
+        '_diff_sum': diff_sum,
+        '_sq_diff_sum': sq_diff_sum,
+    }
+
+
+def ensemble_metrics(cube, time_slice=None, land_mask=None, lat_chunk=10, n_workers=4):
+    """
+    Ensemble and pairwise metrics for a product cube in a single pass.
+
+    cube is a (product, time, latitude, longitude) DataArray, e.g. the
+    temperature of load_product_cube(). Latitude bands of lat_chunk rows are
+    read and processed in parallel threads. Returns per-cell ensemble mean,
+    spread (standard deviation across products), mean rank of each product
+    and pairwise bias (row minus column product) and RMSD, plus
+    area-weighted global bias and RMSD matrices.
+    """
+    if time_slice is not None:
+        cube = cube.sel(time=slice(*time_slice))
+    cube = cube.transpose('product', 'time', 'latitude', 'longitude')
+    if land_mask is not None:
+        land_mask = land_mask.transpose('latitude', 'longitude')
+    n_product, n_time, n_lat, n_lon = cube.shape
+    bands = [slice(start, start + lat_chunk) for start in range(0, n_lat, lat_chunk)]
+
+    def run_band(band):
+        values = cube.isel(latitude=band).values
+        if land_mask is not None:
+            # masked per band, so the lazily opened cube is never loaded whole
+            values = np.where(land_mask.isel(latitude=band).values > 0, values, np.nan)
+        return _ensemble_band(values.reshape(n_product, n_time, -1))
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        results = list(pool.map(run_band, bands))
+
+    def gather(key):
+        # concatenate the per-band cell axis and restore (latitude, longitude)
+        field = np.concatenate([res[key] for res in results], axis=-1)
+        return field.reshape(field.shape[:-1] + (n_lat, n_lon))
+
+    products = cube['product'].values
+    metrics = xr.Dataset(coords={
+        'product': products,
+        'product_b': products,
+        'latitude': cube.latitude,
+        'longitude': cube.longitude,
+    })
+    metrics['ensemble_mean'] = (('latitude', 'longitude'), gather('ensemble_mean'))
+    metrics['ensemble_spread'] = (('latitude', 'longitude'), gather('ensemble_spread'))
+    metrics['mean_rank'] = (('product', 'latitude', 'longitude'), gather('mean_rank'))
+    metrics['bias'] = (('product', 'product_b', 'latitude', 'longitude'), gather('bias'))
+    metrics['rmsd'] = (('product', 'product_b', 'latitude', 'longitude'), gather('rmsd'))
+
+    # area-weighted global matrices from the pairwise sums
+    weights = np.broadcast_to(np.cos(np.radians(cube.latitude.values))[:, None], (n_lat, n_lon))
+    count = (gather('_count') * weights).sum(axis=(-2, -1))
+    metrics['bias_matrix'] = (('product', 'product_b'), (gather('_diff_sum') * weights).sum(axis=(-2, -1)) / count)
+    metrics['rmsd_matrix'] = (('product', 'product_b'), np.sqrt((gather('_sq_diff_sum') * weights).sum(axis=(-2, -1)) / count))
+    metrics.attrs = dict(cube.attrs)
+    return metrics
@@ -0,0 +1,256 @@
+import os
+import numpy as np
+import pandas as pd
+import xarray as xr
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from scipy import stats
+
+
+def decimal_years(time):
+    """Convert a datetime64 time coordinate to decimal years."""
+    times = pd.DatetimeIndex(np.asarray(time))
+    days_in_year = np.where(times.is_leap_year, 366, 365)
+    return (times.year + (times.dayofyear - 1) / days_in_year).values.astype('float64')
+
+
+def _effective_sample_size(resid, n):
+    """
+    Effective sample size from the lag-1 autocorrelation of the residuals
+    (Santer et al. 2000): n_eff = n * (1 - r1) / (1 + r1).
+
+    resid has shape (time, cells) with NaN where data is missing.
+    """
+    res = np.nan_to_num(resid)
+    lag_valid = np.isfinite(resid[1:]) & np.isfinite(resid[:-1])
+    num = np.where(lag_valid, res[1:] * res[:-1], 0).sum(axis=0)
+    den = (res ** 2).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r1 = np.clip(num / den, 0, 0.99)
+    return n * (1 - r1) / (1 + r1), r1
+
+
+def ols_trend(y, t, alpha=0.05):
+    """
+    Batched ordinary least squares trend for every column of y.
+
+    y has shape (time, cells) and may contain NaN, t has shape (time,).
+    Confidence intervals and p-values use the t-distribution with n_eff - 2
+    degrees of freedom, where n_eff corrects for lag-1 autocorrelation.
+    Returns a dict of 1-D arrays of length cells.
+    """
+    valid = np.isfinite(y)
+    n = valid.sum(axis=0).astype('float64')
+    tt = np.where(valid, t[:, None], 0)
+    yy = np.where(valid, y, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_mean = tt.sum(axis=0) / n
+        y_mean = yy.sum(axis=0) / n
+        dt = np.where(valid, t[:, None] - t_mean, 0)
+        dy = np.where(valid, y - y_mean, 0)
+        sxx = (dt ** 2).sum(axis=0)
+        slope = (dt * dy).sum(axis=0) / sxx
+        resid = np.where(valid, dy - slope * dt, np.nan)
+
+        n_eff, r1 = _effective_sample_size(resid, n)
+        dof = n_eff - 2
+        dof = np.where(dof > 0, dof, np.nan)
+        se = np.sqrt(np.nansum(resid ** 2, axis=0) / dof / sxx)
+        t_crit = stats.t.ppf(1 - alpha / 2, dof)
+        p_value = 2 * stats.t.sf(np.abs(slope / se), dof)
+
+    return {
+        'slope': slope,
+        'ci_low': slope - t_crit * se,
+        'ci_high': slope + t_crit * se,
+        'p_value': p_value,
+        'n_eff': n_eff,
+        'r1': r1,
+    }
+
+
+def theil_sen_trend(y, t, alpha=0.05, max_pair_bytes=256 * 2**20):
+    """
+    Batched Theil-Sen trend for every column of y.
+
+    The slope is the median of all pairwise slopes. The confidence interval
+    follows Sen (1968) with the Mann-Kendall variance inflated by n / n_eff to
+    account for lag-1 autocorrelation. Cells are processed in batches so the
+    pairwise arrays (differences, sorted slopes and their signs) stay below
+    max_pair_bytes in total.
+    Returns a dict of 1-D arrays of length cells.
+    """
+    n_time, n_cells = y.shape
+    i, j = np.triu_indices(n_time, k=1)
+    dt = t[j] - t[i]
+    batch = max(1, int(max_pair_bytes // (3 * len(i) * 8)))
+
+    out = {key: np.full(n_cells, np.nan) for key in ('slope', 'ci_low', 'ci_high', 'p_value', 'n_eff', 'r1')}
+    z = stats.norm.ppf(1 - alpha / 2)
+
+    for start in range(0, n_cells, batch):
+        cells = slice(start, start + batch)
+        yb = y[:, cells]
+        diffs = yb[j] - yb[i]
+        pair_slopes = np.sort(diffs / dt[:, None], axis=0)  # NaN pairs sort to the end
+        m = np.isfinite(pair_slopes).sum(axis=0)
+        n = np.isfinite(yb).sum(axis=0).astype('float64')
+        ok = m > 0
+        cols = np.arange(yb.shape[1])
+
+        lo_mid = np.clip((m - 1) // 2, 0, None)
+        hi_mid = np.clip(m // 2, 0, None)
+        slope = 0.5 * (pair_slopes[lo_mid, cols] + pair_slopes[hi_mid, cols])
+        slope = np.where(ok, slope, np.nan)
+
+        # residual autocorrelation about the Sen line; columns without valid
+        # pairs are skipped so nanmedian never sees an all-NaN slice
+        intercept = np.full(yb.shape[1], np.nan)
+        if ok.any():
+            intercept[ok] = np.nanmedian(yb[:, ok] - slope[ok] * t[:, None], axis=0)
+        resid = yb - (intercept + slope * t[:, None])
+        n_eff, r1 = _effective_sample_size(resid, n)
+
+        # Mann-Kendall statistic and autocorrelation-corrected variance
+        s = np.nansum(np.sign(diffs), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var_s = n * (n - 1) * (2 * n + 5) / 18 * (n / n_eff)
+            c = z * np.sqrt(var_s)
+            lo = np.clip(np.round((m - c) / 2).astype('int64') - 1, 0, np.maximum(m - 1, 0))
+            hi = np.clip(np.round((m + c) / 2).astype('int64'), 0, np.maximum(m - 1, 0))
+            z_mk = (s - np.sign(s)) / np.sqrt(var_s)
+
+        out['slope'][cells] = slope
+        out['ci_low'][cells] = np.where(ok, pair_slopes[lo, cols], np.nan)
+        out['ci_high'][cells] = np.where(ok, pair_slopes[hi, cols], np.nan)
+        out['p_value'][cells] = np.where(ok, 2 * stats.norm.sf(np.abs(z_mk)), np.nan)
+        out['n_eff'][cells] = n_eff
+        out['r1'][cells] = r1
+
+    return out
+
+
+TREND_METHODS = {
+    'ols': ols_trend,
+    'theil_sen': theil_sen_trend,
+}
+
+
+def _trend_band(values, t, method, alpha, **kwargs):
+    """Run the trend method on one (time, latitude, longitude) band."""
+    n_time, n_lat, n_lon = values.shape
+    result = TREND_METHODS[method](values.reshape(n_time, -1).astype('float64'), t, alpha=alpha, **kwargs)
+    return {key: val.reshape(n_lat, n_lon) for key, val in result.items()}
+
+
+# float64 copies of a (time, latitude, longitude) band each method holds at
+# once, used to size the bands from max_memory_bytes
+_BAND_COPIES = {
+    'ols': 12,
+    'theil_sen': 4,
+}
+
+
+def _valid_times(da, lat_chunk=40):
+    """Boolean mask of the times at which da has valid data somewhere, read one band at a time."""
+    valid = np.zeros(da.sizes['time'], dtype=bool)
+    for start in range(0, da.sizes['latitude'], lat_chunk):
+        band = da.isel(latitude=slice(start, start + lat_chunk)).transpose('time', 'latitude', 'longitude').values
+        valid |= np.isfinite(band).reshape(len(valid), -1).any(axis=1)
+    return valid
+
+
+def common_period(*sources, lat_chunk=40):
+    """First and last time at which every source has valid data somewhere on the grid."""
+    starts, ends = [], []
+    for da in sources:
+        times = da.time.values[_valid_times(da, lat_chunk)]
+        if len(times) == 0:
+            raise ValueError("A source has no valid data")
+        starts.append(times[0])
+        ends.append(times[-1])
+    return max(starts), min(ends)
+
+
+def calculate_trends(metrics, time_slice=None, method='ols', alpha=0.05, land_only_flag=False,
+                     lat_chunk=40, n_workers=None, max_memory_bytes=2**30):
+    """
+    Compute per-cell trends for a TemperatureDatasetMetrics object.
+
+    Trends are computed for the Berkeley Earth and ERA5 anomalies and for the
+    difference series (BE - ERA5). The slope of the difference series is the
+    trend difference, and its confidence interval accounts for the
+    autocorrelation of the paired differences.
+
+    Without a time_slice, all sources are restricted to the period where both
+    BE and ERA5 have data, so their slopes are comparable; the period of each
+    source is recorded in the attributes.
+
+    Latitude bands of at most lat_chunk rows are processed in parallel
+    threads. The band height and number of threads are reduced so the bands
+    in flight stay within max_memory_bytes (at least one latitude row is
+    always processed); Theil-Sen uses half of it for the bands and half for
+    its pairwise slopes. The land mask is applied to each band after it is
+    read, so no source is loaded whole. Slopes and confidence intervals are
+    reported per decade.
+    """
+    if method not in TREND_METHODS:
+        raise ValueError(f"Unknown trend method '{method}', choose from {list(TREND_METHODS)}")
+
+    sources = {
+        'be': metrics.be_data.temperature,
+        'era5': metrics.era5_data.temperature,
+        'difference': metrics.difference,
+    }
+    if time_slice is None:
+        time_slice = common_period(sources['be'], sources['era5'], lat_chunk=lat_chunk)
+    sources = {name: da.sel(time=slice(*time_slice)) for name, da in sources.items()}
+    land_mask = metrics.be_data.land_mask.transpose('latitude', 'longitude') if land_only_flag else None
+
+    reference = sources['be']
+    n_lat = reference.sizes['latitude']
+    n_time = max(da.sizes['time'] for da in sources.values())
+    row_bytes = _BAND_COPIES[method] * n_time * reference.sizes['longitude'] * 8
+    band_bytes = max_memory_bytes // 2 if method == 'theil_sen' else max_memory_bytes
+    n_workers = n_workers or min(32, (os.cpu_count() or 1) + 4)
+    n_workers = int(max(1, min(n_workers, band_bytes // row_bytes)))
+    lat_chunk = int(max(1, min(lat_chunk, band_bytes // n_workers // row_bytes)))
+    kwargs = {'max_pair_bytes': max_memory_bytes // 2 // n_workers} if method == 'theil_sen' else {}
+    bands = [slice(start, start + lat_chunk) for start in range(0, n_lat, lat_chunk)]
+
+    def run_band(da, t, band):
+        values = da.isel(latitude=band).transpose('time', 'latitude', 'longitude').values
+        if land_mask is not None:
+            values = np.where(land_mask.isel(latitude=band).values > 0, values, np.nan)
+        return _trend_band(values, t, method, alpha, **kwargs)
+
+    trends = xr.Dataset(coords={'latitude': reference.latitude, 'longitude': reference.longitude})
+    trends.attrs = {
+        'variable': metrics.variable,
+        'method': method,
+        'alpha': alpha,
+        'slope_units': 'degrees C per decade',
+    }
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        for name, da in sources.items():
+            print(f"Calculating {method} trends for {name}")
+            # sources can have different time axes (difference is an inner join)
+            t = decimal_years(da.time)
+            results = list(pool.map(lambda band: run_band(da, t, band), bands))
+            for key in results[0]:
+                field = np.concatenate([res[key] for res in results], axis=0)
+                if key in ('slope', 'ci_low', 'ci_high'):
+                    field = field * 10  # per year -> per decade
+                trends[f'{name}_{key}'] = (('latitude', 'longitude'), field)
+            trends.attrs[f'{name}_time_start'] = str(da.time.values[0])[:10]
+            trends.attrs[f'{name}_time_end'] = str(da.time.values[-1])[:10]
+
+    return trends
+
+
+def write_trends(trends, path):
+    """Write a trends dataset to a compressed gridded NetCDF file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    encoding = {var: {'zlib': True, 'complevel': 4} for var in trends.data_vars}
+    trends.to_netcdf(path, encoding=encoding)
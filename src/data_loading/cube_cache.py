@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+import xarray as xr
+from pathlib import Path
+
+# bump when the on-disk layout of a cache entry changes
+CACHE_VERSION = 2
+
+# bytes hashed from the start and end of each input file
+_SAMPLE_BYTES = 2**20
+
+# temporary entries older than this are left over from failed writes
+_STALE_TMP_SECONDS = 86400
+
+
+def file_fingerprint(path):
+    """
+    Hash identifying the contents of a (possibly multi-GB) input file.
+
+    Combines the resolved path, size and modification time with a hash of the
+    first and last MiB, so the key changes when the file is rewritten without
+    reading the whole file.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    h = hashlib.sha1(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, 'rb') as f:
+        h.update(f.read(_SAMPLE_BYTES))
+        if stat.st_size > _SAMPLE_BYTES:
+            f.seek(max(stat.st_size - _SAMPLE_BYTES, _SAMPLE_BYTES))
+            h.update(f.read(_SAMPLE_BYTES))
+    return h.hexdigest()
+
+
+class CubeCache:
+    """
+    Persistent cache of derived data cubes stored as memory-mapped .npy files.
+
+    Each entry is a directory holding one raw array per cube, a coords.npz
+    with the coordinate values of every cube (cubes may have different time
+    axes) and a meta.json with dims and attributes.
+    Entries are evicted once unused for max_age_days or, least recently used
+    first, when the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=50 * 2**30, max_age_days=30):
+        self.cache_dir = Path(cache_dir) / 'cubes'
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a cache from the cache_* entries of the config file."""
+        return cls(
+            os.path.expanduser(config['cache_folder']),
+            max_bytes=int(config.get('cache_max_size_gb', 50) * 2**30),
+            max_age_days=config.get('cache_max_age_days', 30),
+        )
+
+    @staticmethod
+    def key(paths, **params):
+        """Cache key from the fingerprints of the input files and any parameters."""
+        h = hashlib.sha1(f"v{CACHE_VERSION}".encode())
+        for path in paths:
+            h.update(file_fingerprint(os.path.expanduser(path)).encode())
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        """Return a dict of memory-mapped DataArrays for key, or None on a miss."""
+        entry = self.cache_dir / key
+        meta_file = entry / 'meta.json'
+        if not meta_file.exists():
+            return None
+        with open(meta_file) as f:
+            meta = json.load(f)
+
+        with np.load(entry / 'coords.npz') as coord_file:
+            coord_values = {name: coord_file[name] for name in coord_file.files}
+        cubes = {}
+        for name, info in meta['cubes'].items():
+            coords = {c: (c_dims, coord_values[f"{name}__{c}"]) for c, c_dims in info['coords'].items()}
+            cubes[name] = xr.DataArray(
+                np.load(entry / f"{name}.npy", mmap_mode='r'),
+                dims=info['dims'], coords=coords, name=name, attrs=info['attrs'],
+            )
+        os.utime(meta_file)  # mark as recently used for eviction
+        return cubes
+
+    def put(self, key, cubes):
+        """
+        Store a dict of DataArrays under key and return their memory-mapped copies.
+
+        The entry is written to a temporary directory and renamed into place so
+        concurrent notebook sessions never see a partial entry. If the entry
+        cannot be written (e.g. the disk is full) or read back, the in-memory
+        cubes are returned instead.
+        """
+        try:
+            self._write(key, cubes)
+            self.evict(keep=key)
+            cached = self.get(key)
+        except OSError as err:
+            print(f"Could not cache cubes in {self.cache_dir}: {err}")
+            return cubes
+        return cached if cached is not None else cubes
+
+    def _write(self, key, cubes):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_dir / f".{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            tmp.mkdir()
+            coord_values, meta_cubes = {}, {}
+            for name, da in cubes.items():
+                out = np.lib.format.open_memmap(tmp / f"{name}.npy", mode='w+', dtype=da.dtype, shape=da.shape)
+                out[...] = da.values
+                out.flush()
+                del out
+                # coordinates are stored per cube, e.g. difference is an inner join
+                # of the BE and ERA5 time axes and may be shorter than either
+                for c, coord in da.coords.items():
+                    coord_values[f"{name}__{c}"] = coord.values
+                meta_cubes[name] = {
+                    'dims': list(da.dims),
+                    'coords': {c: list(coord.dims) for c, coord in da.coords.items()},
+                    'attrs': da.attrs,
+                }
+
+            np.savez(tmp / 'coords.npz', **coord_values)
+            with open(tmp / 'meta.json', 'w') as f:
+                json.dump({'created': time.time(), 'cubes': meta_cubes}, f, default=str)
+
+            try:
+                os.replace(tmp, self.cache_dir / key)
+            except OSError:
+                pass  # another session stored the same entry first
+        finally:
+            # removes a partial entry after a failed write
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def entries(self):
+        """List (path, size in bytes, last access time) for every cache entry."""
+        if not self.cache_dir.exists():
+            return []
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            meta_file = entry / 'meta.json'
+            if entry.name.startswith('.') or not meta_file.exists():
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((entry, size, meta_file.stat().st_mtime))
+        return entries
+
+    def evict(self, keep=None):
+        """
+        Remove expired entries, then least recently used ones until under
+        max_bytes. The entry named keep (e.g. the one just stored) is never
+        removed, even if it alone exceeds max_bytes. Temporary directories
+        left by failed writes are removed once older than a day.
+        """
+        now = time.time()
+        if self.cache_dir.exists():
+            for tmp in self.cache_dir.glob('.*.tmp'):
+                if now - tmp.stat().st_mtime > _STALE_TMP_SECONDS:
+                    shutil.rmtree(tmp, ignore_errors=True)
+
+        entries = []
+        for entry, size, last_access in self.entries():
+            if entry.name == keep:
+                continue
+            if now - last_access > self.max_age:
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                entries.append((entry, size, last_access))
+
+        total = sum(size for entry, size, _ in self.entries() if entry.name == keep)
+        total += sum(size for _, size, _ in entries)
+        for entry, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Remove every cache entry."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,161 @@
+import hashlib
+import pickle
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy.spatial import cKDTree
+from src.data_loading.simple_loader import load_processed_berkeley_earth, load_processed_era5, load_config
+
+EARTH_RADIUS_KM = 6371.0
+
+PRODUCT_LOADERS = {
+    'be': load_processed_berkeley_earth,
+    'era5': load_processed_era5,
+}
+
+# grid indexes already built in this session, keyed by grid hash
+_INDEX_CACHE = {}
+
+
+def _to_xyz(lats, lons):
+    """Convert latitude/longitude in degrees to points on the unit sphere."""
+    lat = np.radians(np.asarray(lats, dtype='float64'))
+    lon = np.radians(np.asarray(lons, dtype='float64'))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+class GridIndex:
+    """KD-tree over the cell centres of a regular latitude/longitude grid."""
+
+    def __init__(self, latitude, longitude, mask=None):
+        self.latitude = np.asarray(latitude)
+        self.longitude = np.asarray(longitude)
+        self.shape = (len(self.latitude), len(self.longitude))
+        lat2d, lon2d = np.meshgrid(self.latitude, self.longitude, indexing='ij')
+        if mask is None:
+            self.cells = np.arange(lat2d.size)
+        else:
+            self.cells = np.flatnonzero(np.asarray(mask, dtype=bool))
+        self.tree = cKDTree(_to_xyz(lat2d.ravel()[self.cells], lon2d.ravel()[self.cells]))
+
+    @staticmethod
+    def grid_key(latitude, longitude, mask=None):
+        """Hash of the grid coordinates (and mask) used to key the cache."""
+        h = hashlib.sha1()
+        h.update(np.ascontiguousarray(latitude, dtype='float64').tobytes())
+        h.update(np.ascontiguousarray(longitude, dtype='float64').tobytes())
+        if mask is not None:
+            h.update(np.packbits(np.asarray(mask, dtype=bool)).tobytes())
+        return h.hexdigest()
+
+    @classmethod
+    def from_dataset(cls, ds, mask=None, cache_dir=None):
+        """
+        Return the index for the grid of ds, reusing an in-memory or on-disk
+        copy when one exists for the same coordinates and mask.
+        """
+        key = cls.grid_key(ds.latitude.values, ds.longitude.values, mask)
+        if key in _INDEX_CACHE:
+            return _INDEX_CACHE[key]
+
+        cache_file = Path(cache_dir) / f"grid_index_{key}.pkl" if cache_dir is not None else None
+        if cache_file is not None and cache_file.exists():
+            with open(cache_file, 'rb') as f:
+                index = pickle.load(f)
+        else:
+            index = cls(ds.latitude.values, ds.longitude.values, mask)
+            if cache_file is not None:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(cache_file, 'wb') as f:
+                    pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        _INDEX_CACHE[key] = index
+        return index
+
+    def query(self, lats, lons):
+        """
+        Resolve coordinates to the nearest grid cell in one batch.
+
+        Returns latitude indices, longitude indices and great-circle distance in km.
+        """
+        chord, nearest = self.tree.query(_to_xyz(lats, lons))
+        lat_idx, lon_idx = np.unravel_index(self.cells[nearest], self.shape)
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+        return lat_idx, lon_idx, distance
+
+
+def _read_points(da, lat_idx, lon_idx, tile=None):
+    """
+    Read the (time, point) values of da at the given cell indices.
+
+    Points are grouped into tiles matching the on-disk chunking of the file
+    (or tile if given) and only the bounding box of the points in each tile
+    is read.
+    """
+    da = da.transpose('time', 'latitude', 'longitude')
+    if tile is None:
+        chunks = da.encoding.get('chunksizes')
+        tile = tuple(chunks[-2:]) if chunks else (32, 32)
+    tile_lat, tile_lon = tile
+
+    tile_ids = (lat_idx // tile_lat) * (da.sizes['longitude'] // tile_lon + 1) + lon_idx // tile_lon
+    out = np.full((da.sizes['time'], len(lat_idx)), np.nan, dtype='float32')
+    for tile_id in np.unique(tile_ids):
+        members = np.flatnonzero(tile_ids == tile_id)
+        lat0, lat1 = lat_idx[members].min(), lat_idx[members].max()
+        lon0, lon1 = lon_idx[members].min(), lon_idx[members].max()
+        block = da.isel(latitude=slice(lat0, lat1 + 1), longitude=slice(lon0, lon1 + 1)).values
+        out[:, members] = block[:, lat_idx[members] - lat0, lon_idx[members] - lon0]
+    return out
+
+
+def resolve_points(latitudes, longitudes, names=None, land_only_flag=False):
+    """
+    Map point coordinates to their nearest Berkeley Earth grid cell.
+
+    With land_only_flag, points are snapped to the nearest cell with a
+    non-zero land fraction.
+    Returns a DataFrame indexed by point name.
+    """
+    config = load_config()
+    reference = load_processed_berkeley_earth('tavg')
+    # any non-zero land fraction counts as land, as in slice_data
+    mask = reference.land_mask.values > 0 if land_only_flag else None
+    index = GridIndex.from_dataset(reference, mask=mask, cache_dir=config.get('cache_folder'))
+
+    lat_idx, lon_idx, distance = index.query(latitudes, longitudes)
+    names = np.arange(len(lat_idx)) if names is None else np.asarray(names)
+    return pd.DataFrame({
+        'latitude': np.asarray(latitudes, dtype='float64'),
+        'longitude': np.asarray(longitudes, dtype='float64'),
+        'lat_idx': lat_idx,
+        'lon_idx': lon_idx,
+        'grid_latitude': index.latitude[lat_idx],
+        'grid_longitude': index.longitude[lon_idx],
+        'distance_km': distance,
+    }, index=pd.Index(names, name='point'))
+
+
+def extract_points(latitudes, longitudes, names=None, variables=('tavg', 'tmax', 'tmin'),
+                   products=('be', 'era5'), time_slice=None, land_only_flag=False, tile=None):
+    """
+    Extract anomaly time series at many points for every variable and product.
+
+    Returns a (point, time) indexed DataFrame with one float32 column per
+    product and variable, e.g. 'be_tavg' and 'era5_tavg'.
+    """
+    points = resolve_points(latitudes, longitudes, names, land_only_flag)
+    lat_idx = points['lat_idx'].values
+    lon_idx = points['lon_idx'].values
+
+    columns = []
+    for variable in variables:
+        for product in products:
+            da = PRODUCT_LOADERS[product](variable).temperature
+            if time_slice is not None:
+                da = da.sel(time=slice(*time_slice))
+            values = _read_points(da, lat_idx, lon_idx, tile)
+            index = pd.MultiIndex.from_product([points.index, da.time.values], names=['point', 'time'])
+            columns.append(pd.Series(values.T.ravel(), index=index, name=f'{product}_{variable}'))
+
+    return pd.concat(columns, axis=1)
@@ -0,0 +1,247 @@
+import os
+import uuid
+import netCDF4
+import numpy as np
+import pandas as pd
+import xarray as xr
+from pathlib import Path
+from src.data_loading.simple_loader import load_processed_berkeley_earth, load_processed_era5, load_config
+from src.data_loading.cube_cache import CubeCache
+
+# Registered gridded products: name -> opener(variable, reference, baseline).
+# An opener returns the product's monthly anomalies (relative to baseline) on
+# the grid of reference, the Berkeley Earth anomalies of the same variable.
+PRODUCTS = {}
+
+# time is stored in the product cubes as days since this date
+TIME_UNITS = 'days since 1850-01-01'
+
+# years of data a product needs inside the baseline for its climatology
+DEFAULT_MIN_BASELINE_YEARS = 25
+
+
+def register_product(name, opener):
+    """Register a gridded product under name."""
+    PRODUCTS[name] = opener
+    return opener
+
+
+def regrid_to_grid(da, reference):
+    """
+    Regrid a (time, latitude, longitude) DataArray to the grid of reference.
+
+    Longitudes are converted to -180..180, the field is interpolated to the
+    reference cell centres and masked where reference is missing. Global
+    grids are padded with one periodic column on each side so cells near the
+    dateline are interpolated across it. Time stamps are matched by calendar
+    month, since products stamp their months differently (e.g. BE decimal
+    years vs ERA5 mean valid time).
+    """
+    da = da.assign_coords(longitude=(da.longitude + 180) % 360 - 180).sortby('longitude')
+    if da.latitude.values[0] > da.latitude.values[-1]:
+        da = da.sortby('latitude')
+    lon = da.longitude.values
+    step = np.median(np.diff(lon))
+    if abs(lon[-1] - lon[0] + step - 360) < step / 2:
+        da = xr.concat([
+            da.isel(longitude=[-1]).assign_coords(longitude=[lon[-1] - 360]),
+            da,
+            da.isel(longitude=[0]).assign_coords(longitude=[lon[0] + 360]),
+        ], dim='longitude')
+    da = da.interp(latitude=reference.latitude, longitude=reference.longitude)
+    da = align_to_months(da, reference.time)
+    return da.where(reference.notnull())
+
+
+def align_to_months(da, target_time):
+    """Relabel da onto target_time by matching calendar months; missing months become NaN."""
+    target_months = pd.DatetimeIndex(target_time.values).to_period('M')
+    months = pd.DatetimeIndex(da.time.values).to_period('M')
+    da = da.assign_coords(time=months).reindex(time=target_months)
+    return da.assign_coords(time=target_time.values)
+
+
+def _anomalies(da, baseline, min_years=DEFAULT_MIN_BASELINE_YEARS):
+    """
+    Monthly anomalies of absolute temperature relative to baseline=(start_year, end_year).
+
+    Raises ValueError unless every calendar month has data in at least
+    min_years years of the baseline, so products are not compared against
+    climatologies from different periods.
+    """
+    window = da.sel(time=slice(f'{baseline[0]}-01-01', f'{baseline[1]}-12-31'))
+    has_data = window.notnull().any(dim=['latitude', 'longitude'])
+    years_per_month = has_data.groupby('time.month').sum().reindex(month=np.arange(1, 13), fill_value=0)
+    if int(years_per_month.min()) < min_years:
+        raise ValueError(
+            f"Product covers only {int(years_per_month.min())} years of the {baseline[0]}-{baseline[1]} "
+            f"baseline for some month, at least {min_years} are required"
+        )
+    clim = window.groupby('time.month').mean('time')
+    return (da.groupby('time.month') - clim).drop_vars('month', errors='ignore')
+
+
+def _open_berkeley_earth(variable, reference, baseline):
+    return reference
+
+
+def _open_era5(variable, reference, baseline):
+    era5 = load_processed_era5(variable, baseline=baseline).temperature
+    return align_to_months(era5, reference.time)
+
+
+def config_product_opener(spec, min_baseline_years=DEFAULT_MIN_BASELINE_YEARS):
+    """
+    Opener for a product described in the products section of the config.
+
+    spec has per-variable 'files', the name of the temperature variable in
+    those files ('variable_name', a string or per-variable mapping) and
+    'kelvin' if the values are in K. Files hold absolute monthly temperature
+    on any regular latitude/longitude grid. spec may override
+    min_baseline_years. The opener's variables attribute lists the variables
+    the product provides.
+    """
+    def opener(variable, reference, baseline):
+        ds = xr.open_dataset(os.path.expanduser(spec['files'][variable]))
+        name = spec['variable_name']
+        da = ds[name[variable] if isinstance(name, dict) else name]
+        if 'valid_time' in da.dims:
+            da = da.rename({'valid_time': 'time'})
+        if spec.get('kelvin', False):
+            da = da - 273.15
+        min_years = spec.get('min_baseline_years', min_baseline_years)
+        return _anomalies(regrid_to_grid(da, reference), baseline, min_years)
+    opener.variables = set(spec['files'])
+    return opener
+
+
+register_product('be', _open_berkeley_earth)
+register_product('era5', _open_era5)
+
+
+def register_config_products(config=None):
+    """Register every product listed in the products section of the config."""
+    config = config or load_config()
+    min_years = config.get('ensemble_min_baseline_years', DEFAULT_MIN_BASELINE_YEARS)
+    for name, spec in (config.get('products') or {}).items():
+        register_product(name, config_product_opener(spec, min_years))
+    return list(PRODUCTS)
+
+
+def product_cube_path(variable, config=None):
+    config = config or load_config()
+    return Path(os.path.expanduser(config['ensemble_folder'])) / f"products_{variable.upper()}.nc"
+
+
+def _provides_variable(name, variable):
+    """False for products without data for variable, e.g. a tavg-only config product."""
+    variables = getattr(PRODUCTS[name], 'variables', None)
+    return variables is None or variable in variables
+
+
+def _cube_settings(config, variable, products=None, baseline=None):
+    """
+    Resolve the product list and baseline of a cube from the arguments and
+    config. Products that do not provide variable are skipped.
+    """
+    register_config_products(config)
+    products = [name for name in (products or PRODUCTS) if _provides_variable(name, variable)]
+    baseline = tuple(baseline or config.get('ensemble_baseline', (1951, 1980)))
+    return products, baseline
+
+
+def cube_signature(variable, products, baseline, time_slice, config):
+    """
+    Key identifying the inputs of a product cube: fingerprints of the BE
+    reference and every product file known from the config, plus the
+    product list, baseline and time slice.
+    """
+    files = [config['processed'][variable]['berkeley_earth_file']]
+    config_products = config.get('products') or {}
+    for name in products:
+        if name == 'era5':
+            files.append(config['processed'][variable]['era5_file'])
+        elif name in config_products and variable in config_products[name]['files']:
+            files.append(config_products[name]['files'][variable])
+    return CubeCache.key(
+        files, products=products, baseline=baseline, time_slice=time_slice,
+        min_baseline_years=config.get('ensemble_min_baseline_years', DEFAULT_MIN_BASELINE_YEARS),
+    )
+
+
+def product_cube_is_current(variable='tavg', products=None, baseline=None, time_slice=None):
+    """True if the stored cube exists and was built from the current inputs and settings."""
+    config = load_config()
+    path = product_cube_path(variable, config)
+    if not path.exists():
+        return False
+    products, baseline = _cube_settings(config, variable, products, baseline)
+    with netCDF4.Dataset(path) as nc:
+        stored = getattr(nc, 'signature', None)
+    return stored == cube_signature(variable, products, baseline, time_slice, config)
+
+
+def build_product_cube(variable='tavg', products=None, baseline=None, time_slice=None, lat_chunk=10):
+    """
+    Regrid every product once and store them in one chunked NetCDF file.
+
+    The file holds temperature(product, time, latitude, longitude) anomalies
+    relative to a common baseline on the Berkeley Earth grid. Products are
+    written one at a time, so only one product is in memory at once. Chunks
+    hold one product and a band of lat_chunk latitudes, matching the bands
+    read by the ensemble metrics. The cube is written to a temporary file and
+    moved into place once every product is written, so a failed build never
+    leaves a partial cube with a valid signature.
+    """
+    config = load_config()
+    products, baseline = _cube_settings(config, variable, products, baseline)
+
+    reference = load_processed_berkeley_earth(variable, baseline=baseline).temperature
+    if time_slice is not None:
+        reference = reference.sel(time=slice(*time_slice))
+    reference = reference.transpose('time', 'latitude', 'longitude')
+    n_time, n_lat, n_lon = reference.shape
+
+    path = product_cube_path(variable, config)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with netCDF4.Dataset(tmp, 'w') as nc:
+            nc.createDimension('product', len(products))
+            nc.createDimension('time', n_time)
+            nc.createDimension('latitude', n_lat)
+            nc.createDimension('longitude', n_lon)
+
+            product_var = nc.createVariable('product', str, ('product',))
+            product_var[:] = np.array(products, dtype=object)
+            time_var = nc.createVariable('time', 'f8', ('time',))
+            time_var.units = TIME_UNITS
+            time_var.calendar = 'proleptic_gregorian'
+            time_var[:] = (reference.time.values - np.datetime64('1850-01-01')) / np.timedelta64(1, 'D')
+            nc.createVariable('latitude', 'f4', ('latitude',))[:] = reference.latitude.values
+            nc.createVariable('longitude', 'f4', ('longitude',))[:] = reference.longitude.values
+
+            temperature = nc.createVariable(
+                'temperature', 'f4', ('product', 'time', 'latitude', 'longitude'),
+                zlib=True, complevel=1, fill_value=np.float32(np.nan),
+                chunksizes=(1, min(n_time, 120), min(n_lat, lat_chunk), n_lon),
+            )
+            temperature.units = 'degrees C'
+            nc.variable = variable
+            nc.baseline = f"{baseline[0]}-{baseline[1]}"
+
+            for i, name in enumerate(products):
+                print(f"Regridding and writing {name} {variable.upper()}")
+                member = PRODUCTS[name](variable, reference, baseline)
+                temperature[i] = member.transpose('time', 'latitude', 'longitude').values.astype('float32')
+            nc.signature = cube_signature(variable, products, baseline, time_slice, config)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    return path
+
+
+def load_product_cube(variable='tavg'):
+    """Open the product cube of a variable lazily."""
+    return xr.open_dataset(product_cube_path(variable))
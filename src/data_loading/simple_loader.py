@@ -3,6 +3,7 @@ import yaml
 import os
 from pathlib import Path
 import scipy.io as sio
+from src.preprocessing.baselines import baseline_stats_path, rebase
 
 
 def load_config():
@@ -27,17 +28,26 @@ def load_era5():
     file_path = os.path.expanduser(config['ERA5_monthly_folder'])    
     return xr.open_mfdataset(f"{file_path}/*.nc").load()
 
-def load_processed_berkeley_earth(variable='tavg'):
-    """Load processed Berkeley Earth data."""
+def _open_processed(file_path, baseline=None):
+    """Open a processed file, optionally re-referenced to baseline=(start_year, end_year)."""
+    ds = xr.open_dataset(file_path)
+    if baseline is None:
+        return ds
+    stats_path = baseline_stats_path(file_path)
+    stats = xr.open_dataset(stats_path) if stats_path.exists() else None
+    return rebase(ds, baseline, stats)
+
+def load_processed_berkeley_earth(variable='tavg', baseline=None):
+    """Load processed Berkeley Earth data, optionally rebased to baseline=(start_year, end_year)."""
     config = load_config()
     file_path = os.path.expanduser(config['processed'][variable]['berkeley_earth_file'])
-    return xr.open_dataset(file_path)
+    return _open_processed(file_path, baseline)
 
-def load_processed_era5(variable='tavg'):
-    """Load processed ERA5 data."""
+def load_processed_era5(variable='tavg', baseline=None):
+    """Load processed ERA5 data, optionally rebased to baseline=(start_year, end_year)."""
     config = load_config()
     file_path = os.path.expanduser(config['processed'][variable]['era5_file'])
-    return xr.open_dataset(file_path)
+    return _open_processed(file_path, baseline)
 
 def load_elevation_data():
     """Load elevation data from path in config."""
@@ -0,0 +1,112 @@
+import numpy as np
+import xarray as xr
+from pathlib import Path
+
+# Baseline statistics are stored per block of BLOCK_YEARS years, aligned like
+# the WMO normals (1951-1960, 1961-1970, ...), so any baseline made of whole
+# blocks (1951-1980, 1961-1990, 1991-2020, ...) can be derived from them.
+BLOCK_YEARS = 10
+
+
+def block_start(year):
+    """First year of the block containing year."""
+    return ((year - 1) // BLOCK_YEARS) * BLOCK_YEARS + 1
+
+
+def baseline_stats_path(processed_file):
+    """Path of the baseline statistics file stored alongside a processed file."""
+    processed_file = Path(processed_file)
+    return processed_file.with_name(f"{processed_file.stem}_baseline_stats.nc")
+
+
+def _monthly_climatology(climatology):
+    """Return the climatology with its month dimension named 'month' and labelled 1-12."""
+    if 'month_number' in climatology.dims:
+        climatology = climatology.rename({'month_number': 'month'})
+    return climatology.assign_coords(month=np.arange(1, 13))
+
+
+def baseline_statistics(temperature, climatology=None):
+    """
+    Per-block, per-month sums and counts of absolute temperature.
+
+    temperature is either absolute temperature, or anomalies together with
+    the climatology they are relative to. Sums are stored as float32 (at most
+    BLOCK_YEARS values each) and counts as int8.
+    """
+    if climatology is not None:
+        temperature = temperature.groupby('time.month') + _monthly_climatology(climatology)
+        temperature = temperature.drop_vars('month', errors='ignore')
+
+    blocks = block_start(temperature.time.dt.year)
+    sums, counts = [], []
+    block_starts = np.unique(blocks.values)
+    for start in block_starts:
+        block = temperature.isel(time=np.flatnonzero(blocks.values == start))
+        sums.append(block.groupby('time.month').sum('time', skipna=True).reindex(month=np.arange(1, 13), fill_value=0))
+        counts.append(block.notnull().groupby('time.month').sum('time').reindex(month=np.arange(1, 13), fill_value=0))
+
+    stats = xr.Dataset({
+        'baseline_sum': xr.concat(sums, dim='block').astype('float32'),
+        'baseline_count': xr.concat(counts, dim='block').astype('int8'),
+    })
+    stats = stats.assign_coords(block=block_starts)
+    stats.attrs['block_years'] = BLOCK_YEARS
+    return stats
+
+
+def write_baseline_statistics(stats, processed_file):
+    """Write baseline statistics next to the processed file they describe."""
+    encoding = {var: {'zlib': True, 'complevel': 4} for var in stats.data_vars}
+    stats.to_netcdf(baseline_stats_path(processed_file), encoding=encoding)
+
+
+def derive_climatology(stats, baseline):
+    """
+    Monthly climatology for baseline=(start_year, end_year) from block statistics.
+
+    Raises ValueError if the baseline is not made of whole blocks present in stats.
+    """
+    start_year, end_year = baseline
+    if block_start(start_year) != start_year or (end_year - start_year + 1) % BLOCK_YEARS != 0:
+        raise ValueError(f"Baseline {start_year}-{end_year} is not aligned to {BLOCK_YEARS}-year blocks")
+    needed = np.arange(start_year, end_year + 1, BLOCK_YEARS)
+    missing = np.setdiff1d(needed, stats.block.values)
+    if len(missing):
+        raise ValueError(f"Baseline statistics are missing blocks starting {missing.tolist()}")
+
+    selected = stats.sel(block=needed)
+    total = selected.baseline_sum.astype('float64').sum('block')
+    count = selected.baseline_count.astype('int32').sum('block')
+    return (total / count.where(count > 0)).astype('float32')
+
+
+def rebase(ds, baseline, stats=None):
+    """
+    Re-reference the anomalies of a processed dataset to a new baseline.
+
+    The new climatology is derived from stats when the baseline is made of
+    whole blocks, otherwise from the baseline years of the anomalies
+    themselves. Anomalies are shifted by the change in climatology, which is
+    a broadcast subtraction per calendar month.
+    """
+    old_clim = _monthly_climatology(ds.climatology)
+    new_clim = None
+    if stats is not None:
+        try:
+            new_clim = derive_climatology(stats, baseline)
+        except ValueError:
+            new_clim = None
+    if new_clim is None:
+        start_year, end_year = baseline
+        baseline_anomaly = ds.temperature.sel(time=slice(f'{start_year}-01-01', f'{end_year}-12-31'))
+        new_clim = baseline_anomaly.groupby('time.month').mean('time') + old_clim
+
+    offset = new_clim - old_clim
+    rebased = ds.copy()
+    rebased['temperature'] = (ds.temperature.groupby('time.month') - offset).drop_vars('month', errors='ignore')
+    month_dim = 'month_number' if 'month_number' in ds.climatology.dims else 'month'
+    new_clim = new_clim.rename({'month': month_dim}).transpose(*ds.climatology.dims)
+    rebased['climatology'] = (ds.climatology.dims, new_clim.values.astype(ds.climatology.dtype))
+    rebased.attrs['baseline'] = f"{baseline[0]}-{baseline[1]}"
+    return rebased
@@ -0,0 +1,125 @@
+import json
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Default limits for the quality checks, can be overridden per report
+DEFAULT_THRESHOLDS = {
+    'era5_kelvin_range': (170.0, 340.0),     # plausible 2m temperature in K
+    'anomaly_range': (-40.0, 40.0),          # plausible monthly anomaly in degrees
+    'max_nan_fraction_jump': 0.01,           # extra NaN fraction allowed after masking
+    'max_time_offset_days': 3.0,             # BE vs ERA5 time stamp offset within a month
+}
+
+
+class ValidationError(ValueError):
+    """Raised when a quality check fails and the report is set to fail fast."""
+
+
+class QualityReport:
+    """
+    Collects quality checks for one pipeline stage.
+
+    Checks are computed from arrays the stage already has in memory, so
+    validation adds no extra reads. Each check is recorded with its statistics
+    and, with fail_fast, the first failing check writes the report to path
+    and raises ValidationError.
+    """
+
+    def __init__(self, stage, path=None, fail_fast=True, thresholds=None):
+        self.stage = stage
+        self.path = path
+        self.fail_fast = fail_fast
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.checks = []
+
+    @property
+    def passed(self):
+        return all(check['passed'] for check in self.checks)
+
+    def record(self, name, passed, **details):
+        """Record the outcome of a check."""
+        check = {'name': name, 'passed': bool(passed), **details}
+        self.checks.append(check)
+        if not passed and self.fail_fast:
+            if self.path is not None:
+                self.write()
+            raise ValidationError(f"{self.stage}: check '{name}' failed: {details}")
+        return check
+
+    def check_coverage(self, name, found, expected):
+        """Check that every expected item (e.g. month) was found."""
+        missing = sorted(set(expected) - set(found))
+        return self.record(name, not missing, expected=len(expected), found=len(found), missing=missing)
+
+    def check_value_range(self, name, values, value_range):
+        """Check the finite values of an array lie within value_range."""
+        values = np.asarray(values)
+        finite = np.isfinite(values)
+        if not finite.any():
+            return self.record(name, False, nan_fraction=1.0, reason='no finite values')
+        vmin, vmax = float(values[finite].min()), float(values[finite].max())
+        lo, hi = value_range
+        return self.record(name, lo <= vmin and vmax <= hi, min=vmin, max=vmax,
+                           allowed=[lo, hi], nan_fraction=float(1 - finite.mean()))
+
+    def check_nan_fraction(self, name, values, reference_values):
+        """Check values have no more NaNs than the reference beyond max_nan_fraction_jump."""
+        nan_fraction = float(np.isnan(np.asarray(values)).mean())
+        reference_fraction = float(np.isnan(np.asarray(reference_values)).mean())
+        jump = nan_fraction - reference_fraction
+        return self.record(name, jump <= self.thresholds['max_nan_fraction_jump'],
+                           nan_fraction=nan_fraction, reference_nan_fraction=reference_fraction, jump=jump)
+
+    def check_time_alignment(self, name, times, reference_times, full_range=False):
+        """
+        Check two monthly time axes cover the same months and that their time
+        stamps within each month differ by at most max_time_offset_days.
+
+        With full_range, every month of either axis must be in the other.
+        Otherwise only months missing inside the span of times count, e.g.
+        ERA5 starting in 1940 against BE starting in 1850. Leading and
+        trailing gaps against the reference are always reported.
+        """
+        times = pd.DatetimeIndex(np.asarray(times))
+        reference_times = pd.DatetimeIndex(np.asarray(reference_times))
+        months = pd.Series(times, index=times.to_period('M'))
+        reference_months = pd.Series(reference_times, index=reference_times.to_period('M'))
+        duplicated = int(months.index.duplicated().sum() + reference_months.index.duplicated().sum())
+        months = months[~months.index.duplicated()]
+        reference_months = reference_months[~reference_months.index.duplicated()]
+        common = months.index.intersection(reference_months.index)
+
+        offsets = (months[common] - reference_months[common]).dt.total_seconds() / 86400 if len(common) else pd.Series([], dtype='float64')
+        max_offset = float(offsets.abs().max()) if len(offsets) else 0.0
+        leading_gap = int((reference_months.index < months.index.min()).sum())
+        trailing_gap = int((reference_months.index > months.index.max()).sum())
+        if full_range:
+            missing = [str(p) for p in reference_months.index.difference(months.index)]
+            extra = [str(p) for p in months.index.difference(reference_months.index)]
+        else:
+            overlap = reference_months.index[(reference_months.index >= months.index.min()) & (reference_months.index <= months.index.max())]
+            missing = [str(p) for p in overlap.difference(months.index)]
+            extra = []
+        return self.record(name, max_offset <= self.thresholds['max_time_offset_days'] and not missing and not extra and not duplicated,
+                           common_months=len(common), missing_months=missing, extra_months=extra,
+                           leading_gap_months=leading_gap, trailing_gap_months=trailing_gap, duplicated_months=duplicated,
+                           max_offset_days=max_offset, mean_offset_days=float(offsets.mean()) if len(offsets) else 0.0)
+
+    def to_dict(self):
+        return {
+            'stage': self.stage,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'passed': self.passed,
+            'thresholds': self.thresholds,
+            'checks': self.checks,
+        }
+
+    def write(self, path=None):
+        """Write the report as JSON to path, or to the path given at construction."""
+        path = Path(path or self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        return path